@@ -1,7 +1,11 @@
-import time, sys, logging, os, re, configparser, uuid, json
-from datetime import datetime
+import time, random, sys, logging, os, re, configparser, uuid, json, queue, atexit, threading
+from logging.handlers import QueueHandler, QueueListener, MemoryHandler
+from datetime import datetime, timedelta
 import mysql.connector
-from flask import Flask, jsonify, request, abort
+from mysql.connector import pooling
+import msgspec
+from flask import Flask, jsonify, request, abort, g
+from flask.json.provider import JSONProvider
 from werkzeug.utils import secure_filename
 from math import ceil
 
@@ -10,22 +14,53 @@ class HealthCheckFilter(logging.Filter):
         # Return False to prevent a log message from being emitted
         return "/health" not in record.getMessage()
 
+class MsgspecJSONProvider(JSONProvider):
+    """JSON provider backed by msgspec's C encoder/decoder; datetimes encode as ISO 8601."""
+    # Kept in step with anpr_web.MsgspecJSONProvider (the image copies only
+    # this module). No enc_hook: Decimal encodes natively as a string and any
+    # unsupported type raises TypeError instead of being stringified.
+    _encoder = msgspec.json.Encoder()
+    _decoder = msgspec.json.Decoder()
+
+    def dumps(self, obj, **kwargs):
+        return self._encoder.encode(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        try:
+            return self._decoder.decode(s)
+        except msgspec.DecodeError as e:
+            raise ValueError(str(e)) from e
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._encoder.encode(obj), mimetype='application/json')
+
 # --- Flask App Initialization ---
 app = Flask(__name__)
+app.json = MsgspecJSONProvider(app)
 
 # --- Configuration Loading ---
 config = configparser.ConfigParser(interpolation=None)
-config_path = '/app/config.ini'
-if not os.path.exists(config_path):
-    alt_config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.ini')
-    if os.path.exists(alt_config_path):
-        config_path = alt_config_path
-    else:
+# ANPR_CONFIG pins the path (containers); otherwise probe /app, then the module dir
+config_path = os.getenv('ANPR_CONFIG')
+if config_path:
+    if not config.read(config_path):
         logging.basicConfig(level=logging.ERROR)
         logger_fallback = logging.getLogger(__name__)
-        logger_fallback.error(f"CRITICAL: config.ini not found at /app/config.ini or {alt_config_path}.")
+        logger_fallback.error("CRITICAL: config.ini not found at ANPR_CONFIG=%s.", config_path)
         sys.exit(1)
-config.read(config_path)
+else:
+    config_path = '/app/config.ini'
+    if not os.path.exists(config_path):
+        alt_config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.ini')
+        if os.path.exists(alt_config_path):
+            config_path = alt_config_path
+        else:
+            logging.basicConfig(level=logging.ERROR)
+            logger_fallback = logging.getLogger(__name__)
+            logger_fallback.error("CRITICAL: config.ini not found at /app/config.ini or %s.", alt_config_path)
+            sys.exit(1)
+    config.read(config_path)
 
 IMAGE_DIR = config.get('Paths', 'ImageDirectory', fallback='/app/anpr_images')
 LOG_DIR = config.get('General', 'LogDirectory', fallback='/app/logs')
@@ -39,6 +74,7 @@ DB_HOST = os.getenv('DB_HOST', 'mariadb')
 DB_USER = os.getenv('MYSQL_USER', 'anpr_user')
 DB_PASSWORD = os.getenv('MYSQL_PASSWORD')
 DB_NAME = os.getenv('MYSQL_DATABASE', 'anpr_events')
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
 
 # --- Logging Setup ---
 LOG_LEVEL_MAP = {
@@ -57,11 +93,39 @@ health_filter = HealthCheckFilter()
 file_handler.addFilter(health_filter)
 console_handler.addFilter(health_filter)
 
+# Batch file writes: records are buffered and written together once 512
+# accumulate or an ERROR arrives (flushed on close as well).
+file_buffer = MemoryHandler(capacity=512, flushLevel=logging.ERROR, target=file_handler, flushOnClose=True)
+
+# Request threads only enqueue records; a single listener thread does the
+# file/stdout writes, so no request blocks on log I/O.
+log_queue = queue.Queue(-1)
+queue_handler = QueueHandler(log_queue)
+log_listener = QueueListener(log_queue, file_buffer, console_handler, respect_handler_level=True)
+log_listener.start()
+# atexit is LIFO: stop the listener (drains the queue) first, then flush the buffer
+atexit.register(file_buffer.close)
+atexit.register(log_listener.stop)
+
+# Flush the buffer at least once a second so `tail -f` stays near real time
+LOG_FLUSH_INTERVAL = 1.0
+_log_flush_stop = threading.Event()
+
+def flush_log_buffer_periodically():
+    while not _log_flush_stop.wait(LOG_FLUSH_INTERVAL):
+        file_buffer.flush()
+
+threading.Thread(target=flush_log_buffer_periodically, name='log-flush', daemon=True).start()
+atexit.register(_log_flush_stop.set)
+
 logger = logging.getLogger(__name__)
 app.logger.handlers = []; app.logger.propagate = False
-for handler in [file_handler, console_handler]:
-    logger.addHandler(handler)
-    app.logger.addHandler(handler)
+# Re-running this module in the same process (preload + reload) must not
+# stack a second QueueHandler, which would double every record.
+logger.handlers = [h for h in logger.handlers if not isinstance(h, QueueHandler)]
+logger.propagate = False
+logger.addHandler(queue_handler)
+app.logger.addHandler(queue_handler)
 logger.setLevel(log_level)
 app.logger.setLevel(log_level)
 
@@ -74,15 +138,38 @@ def sanitize_filename(filename):
     return sanitized[:200]
 
 TABLE_INITIALIZED = False
+# Failed schema init is retried from get_db_connection(); back off
+# exponentially (0.5s .. 10s, plus jitter) so requests during a DB outage
+# don't each pay a full connect attempt.
+_init_failures = 0
+_init_next_attempt = 0.0
+_init_lock = threading.Lock()
+
+def ensure_index(cursor, index_name, columns):
+    """Create an index on anpr_events if it does not exist yet (idempotent)."""
+    logger.info("Checking if index '%s' exists on anpr_events...", index_name)
+    cursor.execute("""
+        SELECT INDEX_NAME FROM INFORMATION_SCHEMA.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'anpr_events' AND INDEX_NAME = %s
+    """, (index_name,))
+    if cursor.fetchone() is None:
+        logger.info("Index '%s' not found, creating...", index_name)
+        cursor.execute(f"CREATE INDEX {index_name} ON anpr_events ({columns})")
+        logger.info("Index '%s' created.", index_name)
+    else:
+        logger.info("Index '%s' already exists, skipping.", index_name)
 
 def initialize_database():
-    global TABLE_INITIALIZED
+    global TABLE_INITIALIZED, _init_failures, _init_next_attempt
     if TABLE_INITIALIZED:
         return True
+    if time.monotonic() < _init_next_attempt:
+        return False
     conn = None
     try:
         conn = mysql.connector.connect(
-            host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=DB_NAME
+            host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=DB_NAME,
+            connection_timeout=5, use_pure=False
         )
         cursor = conn.cursor()
         
@@ -152,7 +239,7 @@ def initialize_database():
             port = config.getint(section, 'Port', fallback=default_port)
 
             if cam_id is None or friendly_name is None:
-                logger.warning(f"Section [{section}] missing Id or FriendlyName, skipping.")
+                logger.warning("Section [%s] missing Id or FriendlyName, skipping.", section)
                 continue
 
             camera_ids_in_config.append(cam_id)
@@ -165,7 +252,7 @@ def initialize_database():
                     port = VALUES(port),
                     enabled = VALUES(enabled)
             """, (cam_id, friendly_name, ip_address, port, cam_enabled))
-            logger.info(f"Upserted camera id={cam_id} friendly_name='{friendly_name}' enabled={cam_enabled}")
+            logger.info("Upserted camera id=%s friendly_name='%s' enabled=%s", cam_id, friendly_name, cam_enabled)
 
         # Disable cameras in DB that are not in config
         if camera_ids_in_config:
@@ -174,7 +261,7 @@ def initialize_database():
                 f"UPDATE cameras SET enabled = FALSE WHERE id NOT IN ({placeholders})",
                 camera_ids_in_config
             )
-            logger.info(f"Marked cameras not in config as disabled (config ids: {camera_ids_in_config})")
+            logger.info("Marked cameras not in config as disabled (config ids: %s)", camera_ids_in_config)
 
         # --- F3: BACKFILL camera_id from cameras table ---
         logger.info("Backfilling camera_id in anpr_events via JOIN on cameras.friendly_name...")
@@ -185,25 +272,22 @@ def initialize_database():
             WHERE e.camera_id IS NULL
         """)
         rows_updated = cursor.rowcount
-        logger.info(f"Backfill complete: {rows_updated} rows updated.")
+        logger.info("Backfill complete: %s rows updated.", rows_updated)
 
         cursor.execute("SELECT COUNT(*) FROM anpr_events WHERE camera_id IS NULL")
         remaining_nulls = cursor.fetchone()[0]
-        logger.info(f"Remaining anpr_events rows with camera_id IS NULL: {remaining_nulls}")
-
-        # --- F3: ADD INDEX idx_camera_id (idempotent) ---
-        logger.info("Checking if index 'idx_camera_id' exists on anpr_events...")
-        cursor.execute("""
-            SELECT INDEX_NAME FROM INFORMATION_SCHEMA.STATISTICS
-            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'anpr_events' AND INDEX_NAME = 'idx_camera_id'
-        """)
-        index_exists = cursor.fetchone()
-        if index_exists is None:
-            logger.info("Index 'idx_camera_id' not found, creating...")
-            cursor.execute("CREATE INDEX idx_camera_id ON anpr_events (camera_id)")
-            logger.info("Index 'idx_camera_id' created.")
-        else:
-            logger.info("Index 'idx_camera_id' already exists, skipping.")
+        logger.info("Remaining anpr_events rows with camera_id IS NULL: %s", remaining_nulls)
+
+        # Latest-timestamp polling and ORDER BY timestamp DESC pagination
+        ensure_index(cursor, 'idx_timestamp', 'timestamp')
+        # /api/events filter + sort shapes: equality filter, then newest first
+        ensure_index(cursor, 'idx_camera_ts', 'camera_id, timestamp')
+        # idx_camera_ts has camera_id as its left prefix (and backs the FK),
+        # so the old single-column index only added write cost per insert
+        cursor.execute("DROP INDEX IF EXISTS idx_camera_id ON anpr_events")
+        ensure_index(cursor, 'idx_vehicle_type_ts', 'vehicle_type, timestamp')
+        # Plate lookups with plate_match=prefix (LIKE 'ABC%')
+        ensure_index(cursor, 'idx_plate_number', 'plate_number')
 
         # --- F3: ADD FK CONSTRAINT fk_anpr_events_camera (idempotent) ---
         logger.info("Checking if FK constraint 'fk_anpr_events_camera' exists on anpr_events...")
@@ -225,48 +309,84 @@ def initialize_database():
             logger.info("FK constraint 'fk_anpr_events_camera' already exists, skipping.")
 
         conn.commit()
+        invalidate_cameras_cache()  # the camera sync above may have changed the list
         TABLE_INITIALIZED = True
         logger.info("Database schema is up to date.")
         return True
     except mysql.connector.Error as err:
-        logger.error(f"Error initializing database: {err}", exc_info=True)
+        logger.error("Error initializing database: %s", err, exc_info=True)
+        _init_failures += 1
+        _init_next_attempt = time.monotonic() + min(0.5 * 2 ** _init_failures, 10) + random.random() * 0.25
         return False
     finally:
         if conn:
             cursor.close()
             conn.close()
 
+DB_POOL = None
+_db_pool_lock = threading.Lock()
+
+def get_db_pool():
+    """Return the per-worker connection pool, creating it on first use.
+
+    Created lazily (not at import) because MariaDB may still be starting when
+    the worker boots; the pool opens all of its connections up front."""
+    global DB_POOL
+    if DB_POOL is None:
+        with _db_pool_lock:
+            if DB_POOL is None:
+                DB_POOL = pooling.MySQLConnectionPool(
+                    pool_name='anpr_db_manager', pool_size=DB_POOL_SIZE,
+                    host=DB_HOST, user=DB_USER, password=DB_PASSWORD,
+                    database=DB_NAME, connection_timeout=5,
+                    # C extension (bundled in the mysql-connector-python wheels) for row decoding
+                    use_pure=False,
+                    # Reads see fresh data without an explicit COMMIT, so the
+                    # per-checkout COM_RESET_CONNECTION round-trip is unneeded.
+                    autocommit=True, pool_reset_session=False
+                )
+                logger.info("Database connection pool created (size=%s).", DB_POOL_SIZE)
+    return DB_POOL
+
 def get_db_connection():
+    """Lease a pooled connection for the current request (bound to flask.g).
+
+    Routes never close it themselves: close_db_connection() hands it back to
+    the pool on app-context teardown, including when the route raised."""
+    conn = g.get('db')
+    if conn is not None:
+        return conn
     try:
         if not TABLE_INITIALIZED:
-            initialize_database()
-        conn = mysql.connector.connect(
-            host=DB_HOST, user=DB_USER, password=DB_PASSWORD,
-            database=DB_NAME, autocommit=False
-        )
-        logger.debug("Successfully established new database connection.")
+            # One request thread runs the schema setup; the others wait for it
+            with _init_lock:
+                initialize_database()
+        conn = g.db = get_db_pool().get_connection()
         return conn
     except mysql.connector.Error as err:
-        logger.error(f"Failed to connect to database: {err}")
+        logger.error("Failed to connect to database: %s", err)
         return None
 
+@app.teardown_appcontext
+def close_db_connection(exc):
+    conn = g.pop('db', None)
+    if conn is not None:
+        conn.close()
+
 @app.route('/event', methods=['POST'])
 def receive_event():
     conn = get_db_connection()
     if not conn: return jsonify({"status": "error", "message": "Database connection unavailable"}), 503
     if 'event_data' not in request.form:
-        conn.close()
         return jsonify({"status": "error", "message": "Missing 'event_data' in form"}), 400
     try:
         event_data = json.loads(request.form['event_data'])
     except json.JSONDecodeError:
-        conn.close()
         return jsonify({"status": "error", "message": "Invalid JSON in event_data"}), 400
     image_file = request.files.get('image')
     image_filename = None
     if image_file:
         if image_file.filename == '':
-            conn.close()
             return jsonify({"status": "error", "message": "Received image file with no name"}), 400
         timestamp = event_data.get("Timestamp", "notime").replace(":", "-")
         plate = sanitize_filename(event_data.get("PlateNumber", "noplate"))
@@ -277,18 +397,14 @@ def receive_event():
         filepath = os.path.join(IMAGE_DIR, image_filename)
         try:
             image_file.save(filepath)
-            logger.info(f"Image saved to {filepath}")
+            logger.info("Image saved to %s", filepath)
         except Exception as e:
-            logger.error(f"Failed to save image file to {filepath}: {e}", exc_info=True)
-            conn.close()
+            logger.error("Failed to save image file to %s: %s", filepath, e, exc_info=True)
             return jsonify({"status": "error", "message": "Failed to save image"}), 500
-    try:
-        if insert_anpr_event_db(event_data, image_filename, conn):
-            return jsonify({"status": "success", "message": "Event and image processed"}), 201
-        else:
-            return jsonify({"status": "error", "message": "Failed to insert event into database"}), 500
-    finally:
-        if conn and conn.is_connected(): conn.close()
+    if insert_anpr_event_db(event_data, image_filename, conn):
+        return jsonify({"status": "success", "message": "Event and image processed"}), 201
+    else:
+        return jsonify({"status": "error", "message": "Failed to insert event into database"}), 500
 
 # In anpr_db_manager.py
 
@@ -303,7 +419,7 @@ def insert_anpr_event_db(event_data, image_filename, db_conn):
         try:
             camera_id = int(raw_camera_id) if raw_camera_id is not None else None
         except (ValueError, TypeError):
-            logger.warning(f"Invalid CameraId in event_data: {raw_camera_id}. Setting to NULL.")
+            logger.warning("Invalid CameraId in event_data: %s. Setting to NULL.", raw_camera_id)
             camera_id = None
 
         # Read legacy friendly name (CameraID with capital ID)
@@ -314,7 +430,7 @@ def insert_anpr_event_db(event_data, image_filename, db_conn):
             check_cursor = db_conn.cursor()
             check_cursor.execute("SELECT 1 FROM cameras WHERE id = %s", (camera_id,))
             if not check_cursor.fetchone():
-                logger.warning(f"CameraId {camera_id} not in cameras table. Setting to NULL to avoid FK violation.")
+                logger.warning("CameraId %s not in cameras table. Setting to NULL to avoid FK violation.", camera_id)
                 camera_id = None
             check_cursor.close()
 
@@ -330,7 +446,7 @@ def insert_anpr_event_db(event_data, image_filename, db_conn):
         try:
             timestamp_obj = datetime.strptime(timestamp_str, '%Y-%m-%dT%H:%M:%S')
         except ValueError:
-            logger.error(f"Invalid timestamp format: {timestamp_str}")
+            logger.error("Invalid timestamp format: %s", timestamp_str)
             return False
 
         sql = """
@@ -340,17 +456,49 @@ def insert_anpr_event_db(event_data, image_filename, db_conn):
         val = (plate_number, camera_id, camera_friendly_name, timestamp_obj, image_filename, confidence, json.dumps(event_data), vehicle_type, access_status, driving_direction)
 
         cursor.execute(sql, val)
-        last_id = cursor.lastrowid
-        db_conn.commit()
-        logger.info(f"Event for plate '{plate_number}' (camera_id={camera_id}, friendly_name='{camera_friendly_name}', direction: {driving_direction}) inserted successfully. DB Row ID: {last_id}")
+        last_id = cursor.lastrowid  # pool connections autocommit the INSERT
+        logger.info("Event for plate '%s' (camera_id=%s, friendly_name='%s', direction: %s) inserted successfully. DB Row ID: %s",
+                    plate_number, camera_id, camera_friendly_name, driving_direction, last_id)
         return True
     except mysql.connector.Error as err:
-        logger.error(f"Error inserting event into database: {err}", exc_info=True)
-        db_conn.rollback()
+        logger.error("Error inserting event into database: %s", err, exc_info=True)
         return False
     finally:
         if cursor: cursor.close()
 
+# Memo de COUNT por filtro: clave (base_query, params) -> (time.monotonic(), total).
+# Solo caduca por TTL (igual en todos los workers): el total puede ir hasta 30 s atrasado.
+EVENT_COUNT_CACHE_TTL = 30
+EVENT_COUNT_CACHE_MAX = 512
+_event_count_cache = {}
+_event_count_lock = threading.Lock()
+
+def get_cached_event_count(key):
+    with _event_count_lock:
+        entry = _event_count_cache.get(key)
+    if entry and time.monotonic() - entry[0] < EVENT_COUNT_CACHE_TTL:
+        return entry[1]
+    return None
+
+def cache_event_count(key, total):
+    with _event_count_lock:
+        _event_count_cache.pop(key, None)
+        if len(_event_count_cache) >= EVENT_COUNT_CACHE_MAX:
+            # Dicts keep insertion order: drop the oldest entry
+            del _event_count_cache[next(iter(_event_count_cache))]
+        _event_count_cache[key] = (time.monotonic(), total)
+
+MAX_EVENTS_PAGE = 10_000
+MAX_EVENTS_LIMIT = 200
+
+# (parámetro de la query, cláusula SQL, usa LIKE '%valor%')
+EVENT_FILTERS = (
+    ('plate_number', 'plate_number LIKE %s', True),
+    ('vehicle_type', 'vehicle_type = %s', False),
+    ('access_status', 'access_status = %s', False),
+    ('driving_direction', 'driving_direction = %s', False),
+)
+
 @app.route('/api/events', methods=['GET'])
 def get_events():
     conn = get_db_connection()
@@ -359,29 +507,42 @@ def get_events():
     # --- Obtener parámetros de la petición ---
     page = request.args.get('page', 1, type=int)
     limit = request.args.get('limit', 10, type=int)
-    plate_number = request.args.get('plate_number', type=str)
     camera_id_param = request.args.get('camera_id', type=str)
     start_date_str = request.args.get('start_date', type=str)
     end_date_str = request.args.get('end_date', type=str)
     start_time_str = request.args.get('start_time', type=str)
     end_time_str = request.args.get('end_time', type=str)
     
-    # --- NUEVOS PARÁMETROS DE FILTRO ---
-    vehicle_type = request.args.get('vehicle_type', type=str)
-    access_status = request.args.get('access_status', type=str)
-    driving_direction = request.args.get('driving_direction', type=str)
-    
-    offset = (page - 1) * limit
+    # Paginación profunda por cursor: ?before_ts=<timestamp>&before_id=<id> del último evento
+    before_ts_str = request.args.get('before_ts', type=str)
+    before_id = request.args.get('before_id', type=int)
+    before_ts = None
+    if before_ts_str:
+        try:
+            before_ts = datetime.fromisoformat(before_ts_str.replace('Z', '+00:00')).replace(tzinfo=None)
+        except ValueError:
+            return jsonify({"status": "error", "message": "Invalid 'before_ts' timestamp"}), 400
+
+    # Acotar page/limit: un OFFSET arbitrario obligaría a recorrer millones de filas
+    page = max(1, min(page, MAX_EVENTS_PAGE))
+    limit = max(1, min(limit, MAX_EVENTS_LIMIT))
+    offset = 0 if before_ts else (page - 1) * limit
     
     
     # --- Construir la consulta SQL dinámicamente ---
     query_params, where_clauses = [], []
     base_query = "FROM anpr_events"
     
-    # Filtros existentes
-    if plate_number:
-        where_clauses.append("plate_number LIKE %s")
-        query_params.append(f"%{plate_number}%")
+    # Filtros simples (placa, tipo de vehículo, acceso, dirección).
+    # plate_match=prefix busca 'ABC%' (usa idx_plate_number); por defecto '%ABC%'.
+    like_prefix = request.args.get('plate_match') == 'prefix'
+    for param_name, clause, is_like in EVENT_FILTERS:
+        value = request.args.get(param_name)
+        if value:
+            where_clauses.append(clause)
+            if is_like:
+                value = f"{value}%" if like_prefix else f"%{value}%"
+            query_params.append(value)
     if camera_id_param:
         # Try parsing as int (primary path — new FK)
         try:
@@ -393,85 +554,125 @@ def get_events():
             where_clauses.append("camera_friendly_name = %s")
             query_params.append(camera_id_param)
     
-    # Filtro de fecha/hora de inicio
-    if start_date_str:
-        if start_time_str:
-            # Combinar fecha + hora
-            start_datetime = f"{start_date_str} {start_time_str}:00"
+    # Filtros de fecha/hora: se parsean una vez y se enlazan como DATETIME.
+    # Rangos semiabiertos sobre la columna (sin DATE()) para usar idx_timestamp.
+    try:
+        if start_date_str:
+            start_dt = datetime.fromisoformat(f"{start_date_str}T{start_time_str}" if start_time_str else start_date_str)
             where_clauses.append("timestamp >= %s")
-            query_params.append(start_datetime)
-        else:
-            # Solo fecha (comportamiento original)
-            where_clauses.append("DATE(timestamp) >= %s")
-            query_params.append(start_date_str)
-    
-    # Filtro de fecha/hora de fin
-    if end_date_str:
-        if end_time_str:
-            # Combinar fecha + hora
-            end_datetime = f"{end_date_str} {end_time_str}:59"
-            where_clauses.append("timestamp <= %s")
-            query_params.append(end_datetime)
-        else:
-            # Solo fecha (comportamiento original)
-            where_clauses.append("DATE(timestamp) <= %s")
-            query_params.append(end_date_str)
-
-    # --- LÓGICA AÑADIDA PARA NUEVOS FILTROS ---
-    if vehicle_type:
-        where_clauses.append("vehicle_type = %s")
-        query_params.append(vehicle_type)
-    if access_status:
-        where_clauses.append("access_status = %s")
-        query_params.append(access_status)
-    if driving_direction:
-        where_clauses.append("driving_direction = %s")
-        query_params.append(driving_direction)
-    # --- FIN DE LA LÓGICA AÑADIDA ---
+            query_params.append(start_dt)
+        if end_date_str:
+            if end_time_str:
+                # Hasta el final del minuto indicado
+                end_dt = datetime.fromisoformat(f"{end_date_str}T{end_time_str}") + timedelta(minutes=1)
+            else:
+                # Hasta el final del día indicado
+                end_dt = datetime.fromisoformat(end_date_str) + timedelta(days=1)
+            where_clauses.append("timestamp < %s")
+            query_params.append(end_dt)
+    except ValueError:
+        return jsonify({"status": "error", "message": "Invalid date/time filter"}), 400
 
     if where_clauses:
         base_query += " WHERE " + " AND ".join(where_clauses)
-        
-    count_query = "SELECT COUNT(*) " + base_query
-    # La consulta SELECT ya incluye todas las columnas necesarias
-    sql_query = f"SELECT id, plate_number, camera_id, camera_friendly_name, timestamp, image_filename, confidence, processed_data, vehicle_type, access_status, driving_direction {base_query}"
-    
+
+    # Total memorizado para este mismo filtro (páginas 2..N, refrescos del dashboard)
+    count_key = (base_query, tuple(query_params))
+    cached_total = get_cached_event_count(count_key)
+
+    if before_ts or cached_total is not None:
+        # Consulta simple: rango por cursor (before_ts, sin OFFSET) o LIMIT/OFFSET
+        # cuando el total ya se conoce; no hace falta COUNT(*) OVER ().
+        page_where, page_params = "", list(query_params)
+        if before_ts:
+            page_where = " AND " if where_clauses else " WHERE "
+            if before_id is not None:
+                # Desempate por id: eventos con el mismo timestamp no se saltan ni repiten
+                page_where += "(timestamp < %s OR (timestamp = %s AND id < %s))"
+                page_params += [before_ts, before_ts, before_id]
+            else:
+                page_where += "timestamp < %s"
+                page_params.append(before_ts)
+        sql_query = f"""
+            SELECT id, plate_number, camera_id, camera_friendly_name, timestamp, image_filename,
+                   confidence, processed_data, vehicle_type, access_status, driving_direction
+            {base_query}{page_where}
+            ORDER BY timestamp DESC, id DESC LIMIT %s OFFSET %s
+        """
+        sql_params = page_params + [limit, offset]
+    else:
+        # Una sola ida y vuelta: la subconsulta pagina sobre (id, timestamp) y
+        # calcula el total con COUNT(*) OVER (); luego se unen solo las filas de
+        # la página con sus columnas completas (processed_data incluido).
+        sql_query = f"""
+            SELECT e.id, e.plate_number, e.camera_id, e.camera_friendly_name, e.timestamp, e.image_filename,
+                   e.confidence, e.processed_data, e.vehicle_type, e.access_status, e.driving_direction,
+                   p.total_events
+            FROM (
+                SELECT id, timestamp, COUNT(*) OVER () AS total_events {base_query}
+                ORDER BY timestamp DESC, id DESC LIMIT %s OFFSET %s
+            ) p
+            JOIN anpr_events e ON e.id = p.id
+            ORDER BY p.timestamp DESC, p.id DESC
+        """
+        sql_params = query_params + [limit, offset]
+
     try:
-        count_cursor = conn.cursor()
-        count_cursor.execute(count_query, query_params)
-        total_events = count_cursor.fetchone()[0]
-        count_cursor.close()
-        
-        total_pages = ceil(total_events / limit) if limit > 0 else 0
-        
+        # Se recorre el cursor (sin buffer) fila a fila: una sola pasada, sin
+        # materializar antes la lista completa con fetchall().
         data_cursor = conn.cursor(dictionary=True)
-        sql_query += " ORDER BY timestamp DESC LIMIT %s OFFSET %s"
-        data_query_params = query_params.copy()
-        data_query_params.extend([limit, offset])
-        data_cursor.execute(sql_query, data_query_params)
-        events = data_cursor.fetchall()
-        data_cursor.close()
-        
-        for event in events:
-            if event.get('timestamp'): event['timestamp'] = event['timestamp'].isoformat()
-            if event.get('processed_data'):
-                try: event['processed_data'] = json.loads(event['processed_data'])
-                except (json.JSONDecodeError, TypeError):
-                    logger.warning(f"Could not parse processed_data for event ID {event.get('id')}")
+        data_cursor.execute(sql_query, sql_params)
+        events, total_events = [], cached_total
+        for event in data_cursor:
+            total_events = event.pop('total_events', total_events)
+            processed_data = event['processed_data']
+            if processed_data:
+                try: event['processed_data'] = app.json.loads(processed_data)
+                except (ValueError, TypeError):
+                    logger.warning("Could not parse processed_data for event ID %s", event['id'])
                     event['processed_data'] = {}
-                    
+            events.append(event)
+        data_cursor.close()
+
+        if total_events is None:
+            if offset > 0 or before_ts:
+                # No row carries the total (cursor page, or page past the end)
+                count_cursor = conn.cursor()
+                count_cursor.execute("SELECT COUNT(*) " + base_query, query_params)
+                (total_events,) = count_cursor.fetchone()
+                count_cursor.close()
+            else:
+                total_events = 0
+        if cached_total is None:
+            cache_event_count(count_key, total_events)
+
+        total_pages = ceil(total_events / limit) if limit > 0 else 0
+
+        # Cursor para la página siguiente (null cuando no hay más)
+        last_event = events[-1] if len(events) == limit else None
         return jsonify({
             "events": events, "total_pages": total_pages,
-            "current_page": page, "total_events": total_events
+            "current_page": page, "total_events": total_events,
+            "next_before_ts": last_event['timestamp'] if last_event else None,
+            "next_before_id": last_event['id'] if last_event else None
         })
     except mysql.connector.Error as err:
-        logger.error(f"Error fetching events: {err}", exc_info=True)
+        logger.error("Error fetching events: %s", err, exc_info=True)
         return jsonify({"status": "error", "message": "Error querying database"}), 500
-    finally:
-        if conn and conn.is_connected(): conn.close()
+
+CAMERAS_CACHE_TTL = 60
+_cameras_cache = {'ts': 0.0, 'val': None}
+
+def invalidate_cameras_cache():
+    """Drop the cached /api/cameras list so the next request re-reads the table."""
+    _cameras_cache['val'] = None
 
 @app.route('/api/cameras', methods=['GET'])
 def get_cameras():
+    # Cameras only change when config.ini is synced (initialize_database invalidates)
+    if _cameras_cache['val'] is not None and time.monotonic() - _cameras_cache['ts'] < CAMERAS_CACHE_TTL:
+        return jsonify({"cameras": _cameras_cache['val']})
+
     conn = get_db_connection()
     if not conn: abort(503, description="Database connection unavailable")
     cursor = None
@@ -484,13 +685,32 @@ def get_cameras():
             ORDER BY friendly_name
         """)
         cameras = cursor.fetchall()
+        _cameras_cache['val'] = cameras
+        _cameras_cache['ts'] = time.monotonic()
         return jsonify({"cameras": cameras})
     except mysql.connector.Error as err:
-        logger.error(f"Error fetching cameras: {err}", exc_info=True)
+        logger.error("Error fetching cameras: %s", err, exc_info=True)
         return jsonify({"cameras": []}), 500
     finally:
         if cursor: cursor.close()
-        if conn and conn.is_connected(): conn.close()
+
+# The dashboard polls latest_timestamp from every open tab; one lookup per
+# second per worker is enough.
+LATEST_TS_CACHE_TTL = 1.0
+_latest_ts_cache = (0.0, None)  # (time.monotonic() of lookup, latest timestamp)
+
+def get_latest_event_timestamp(cursor):
+    """Newest event timestamp, served from a short in-process cache."""
+    global _latest_ts_cache
+    cached_at, latest_timestamp = _latest_ts_cache
+    if time.monotonic() - cached_at < LATEST_TS_CACHE_TTL:
+        return latest_timestamp
+    # Index tip read on idx_timestamp
+    cursor.execute("SELECT timestamp FROM anpr_events ORDER BY timestamp DESC LIMIT 1")
+    row = cursor.fetchone()
+    latest_timestamp = row[0] if row else None
+    _latest_ts_cache = (time.monotonic(), latest_timestamp)
+    return latest_timestamp
 
 @app.route('/api/events/latest_timestamp', methods=['GET'])
 def get_latest_timestamp():
@@ -503,34 +723,37 @@ def get_latest_timestamp():
     cursor = None
     try:
         cursor = conn.cursor()
-        cursor.execute("SELECT MAX(timestamp) FROM anpr_events")
-        latest_timestamp = cursor.fetchone()[0]
+        latest_timestamp = get_latest_event_timestamp(cursor)
 
         if since_timestamp_str and latest_timestamp:
             try:
-                since_timestamp_obj = datetime.fromisoformat(since_timestamp_str.replace('Z', '+00:00'))
-                cursor.execute(
-                    "SELECT COUNT(*) FROM anpr_events WHERE timestamp > %s", 
-                    (since_timestamp_obj,)
-                )
-                new_events_count = cursor.fetchone()[0]
+                since_timestamp_obj = datetime.fromisoformat(since_timestamp_str.replace('Z', '+00:00')).replace(tzinfo=None)
+                # Nothing newer than 'since': skip the COUNT round-trip
+                if latest_timestamp > since_timestamp_obj:
+                    cursor.execute(
+                        "SELECT COUNT(*) FROM anpr_events WHERE timestamp > %s",
+                        (since_timestamp_obj,)
+                    )
+                    new_events_count = cursor.fetchone()[0]
             except (ValueError, TypeError):
-                logger.warning(f"Invalid 'since' timestamp format received: {since_timestamp_str}")
+                logger.warning("Invalid 'since' timestamp format received: %s", since_timestamp_str)
 
-        return jsonify({
-            "latest_timestamp": latest_timestamp.isoformat() if latest_timestamp else None,
+        resp = jsonify({
+            "latest_timestamp": latest_timestamp,
             "new_events_count": new_events_count
         })
+        # Polls that see no change get an empty 304 (If-None-Match vs body ETag)
+        resp.add_etag()
+        resp.headers['Cache-Control'] = 'no-cache'
+        return resp.make_conditional(request)
     except mysql.connector.Error as err:
-        logger.error(f"Error fetching latest timestamp: {err}", exc_info=True)
+        logger.error("Error fetching latest timestamp: %s", err, exc_info=True)
         return jsonify({"latest_timestamp": None, "new_events_count": 0}), 500
     finally:
         if cursor: cursor.close()
-        if conn and conn.is_connected(): conn.close()
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    conn = None
     try:
         conn = get_db_connection()
         if conn and conn.is_connected():
@@ -538,10 +761,8 @@ def health_check():
         else:
             return jsonify({"status": "error", "message": "Database connection failed"}), 503
     except Exception as e:
-        logger.error(f"Health check failed: {e}", exc_info=True)
+        logger.error("Health check failed: %s", e, exc_info=True)
         return jsonify({"status": "error", "message": "Health check failed"}), 500
-    finally:
-        if conn and conn.is_connected(): conn.close()
 
 if __name__ == '__main__':
     initialize_database()
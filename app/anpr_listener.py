@@ -5,6 +5,8 @@ import time
 import datetime
 import json
 import configparser
+import queue
+import atexit
 import requests
 from ctypes import POINTER, cast, c_ubyte
 from threading import Thread
@@ -15,6 +17,7 @@ from NetSDK.SDK_Enum import *
 from NetSDK.SDK_Callback import *
 
 import logging
+from logging.handlers import QueueHandler, QueueListener
 
 # --- Global Variables ---
 CONFIGURED_CAMERAS = []
@@ -22,18 +25,23 @@ logger = None # Will be initialized in main()
 sdk = None # NetClient instance
 IMAGE_SAVE_DIR = None # Será definido en main() desde el config.ini
 
+# Conexiones keep-alive hacia anpr-db-manager, compartidas por los hilos de envío
+DB_MANAGER_URL = os.getenv('DB_MANAGER_URL', 'http://anpr-db-manager:5001/event')
+db_manager_session = requests.Session()
+db_manager_session.mount('http://', requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=8))
+
 # --- Async Event Sender ---
 def send_event_async(payload, image_path):
     """Function to send event data and image in a separate thread."""
     def task():
-        db_manager_url = os.getenv('DB_MANAGER_URL', 'http://anpr-db-manager:5001/event')
+        db_manager_url = DB_MANAGER_URL
         try:
             with open(image_path, 'rb') as image_file:
                 files = {'image': (os.path.basename(image_path), image_file, 'image/jpeg')}
                 form_data = {'event_data': json.dumps(payload)}
                 
                 logger.debug(f"Sending event for plate {payload.get('PlateNumber')} to {db_manager_url}")
-                response = requests.post(db_manager_url, files=files, data=form_data, timeout=15)
+                response = db_manager_session.post(db_manager_url, files=files, data=form_data, timeout=15)
                 response.raise_for_status()
                 logger.info(f"Async send SUCCESS for plate {payload.get('PlateNumber')}. Status: {response.status_code}")
         except requests.exceptions.RequestException as e:
@@ -201,16 +209,24 @@ def main():
 
     # --- Initialization and Configuration Loading ---
     config = configparser.ConfigParser(interpolation=None)
-    config_path = '/app/config.ini'
-    if not os.path.exists(config_path):
-        alt_config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.ini')
-        if not os.path.exists(alt_config_path):
-            # Usar logging básico si el logger principal aún no está configurado
+    # ANPR_CONFIG fija la ruta (contenedores); si no, se prueba /app y luego el directorio del módulo
+    config_path = os.getenv('ANPR_CONFIG')
+    if config_path:
+        if not config.read(config_path):
             logging.basicConfig(level=logging.ERROR)
-            logging.error(f"CRITICAL: config.ini not found at {config_path} or {alt_config_path}.")
+            logging.error(f"CRITICAL: config.ini not found at ANPR_CONFIG={config_path}.")
             sys.exit(1)
-        config_path = alt_config_path
-    config.read(config_path)
+    else:
+        config_path = '/app/config.ini'
+        if not os.path.exists(config_path):
+            alt_config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.ini')
+            if not os.path.exists(alt_config_path):
+                # Usar logging básico si el logger principal aún no está configurado
+                logging.basicConfig(level=logging.ERROR)
+                logging.error(f"CRITICAL: config.ini not found at {config_path} or {alt_config_path}.")
+                sys.exit(1)
+            config_path = alt_config_path
+        config.read(config_path)
 
     LOG_DIR = config.get('General', 'LogDirectory', fallback='/app/logs')
     os.makedirs(LOG_DIR, exist_ok=True)
@@ -229,10 +245,17 @@ def main():
     file_handler.setFormatter(log_formatter)
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(log_formatter)
+    # Los callbacks del SDK solo encolan; un hilo aparte formatea y escribe
+    log_queue = queue.Queue(-1)
+    log_listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    log_listener.start()
+    atexit.register(log_listener.stop)
     logger = logging.getLogger(__name__)
     logger.setLevel(log_level)
-    for handler in [file_handler, console_handler]:
-        logger.addHandler(handler)
+    # Idempotente: si main() se vuelve a ejecutar en el mismo proceso no se duplican líneas
+    logger.handlers = [h for h in logger.handlers if not isinstance(h, QueueHandler)]
+    logger.propagate = False
+    logger.addHandler(QueueHandler(log_queue))
 
     logger.info("--- anpr_listener: Starting main function ---")
     
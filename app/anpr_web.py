@@ -1,14 +1,44 @@
 import os
+import re
+import time
 from datetime import timedelta
 from functools import wraps
+from threading import Lock
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+import msgspec
 import requests
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_from_directory, abort, session
-from flask_login import LoginManager, login_user, logout_user, login_required, current_user
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_from_directory, session
+from flask.json.provider import JSONProvider
+from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from flask_session import Session
+from flask_compress import Compress
 from app.models import db, User
-from urllib.parse import urlparse
+
+class MsgspecJSONProvider(JSONProvider):
+    """JSON provider backed by msgspec's C encoder/decoder (used by jsonify and get_json)."""
+    # No enc_hook: msgspec natively covers datetime, UUID and Decimal (as a
+    # string, like Flask's provider); anything else raises TypeError.
+    _encoder = msgspec.json.Encoder()
+    _decoder = msgspec.json.Decoder()
+
+    def dumps(self, obj, **kwargs):
+        return self._encoder.encode(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        try:
+            return self._decoder.decode(s)
+        except msgspec.DecodeError as e:
+            # Flask/Werkzeug treat ValueError as "invalid JSON body" (400)
+            raise ValueError(str(e)) from e
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._encoder.encode(obj), mimetype='application/json')
 
 app = Flask(__name__)
+app.json = MsgspecJSONProvider(app)
 
 # --- Configuration ---
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev_key_please_change_in_prod')
@@ -19,6 +49,15 @@ app.config['SQLALCHEMY_DATABASE_URI'] = (
     f"{os.getenv('MYSQL_DATABASE', 'anpr_events')}"
 )
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Per-worker pool: pre-ping replaces connections MariaDB dropped while idle
+# (wait_timeout / restarts) instead of failing the first request after it.
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'pool_pre_ping': True,
+    'pool_recycle': 1800,
+    'pool_size': int(os.getenv('SQLA_POOL_SIZE', '5')),
+    'max_overflow': int(os.getenv('SQLA_MAX_OVERFLOW', '10')),
+    'pool_timeout': 30,
+}
 
 # --- Session Configuration (server-side, DB-backed) ---
 app.config['SESSION_TYPE'] = 'sqlalchemy'
@@ -27,10 +66,71 @@ app.config['SESSION_PERMANENT'] = True
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=2)
 app.config['SESSION_USE_SIGNER'] = True
 app.config['SESSION_KEY_PREFIX'] = 'anpr_session:'
+# On roughly 1 in N requests flask-session deletes expired rows itself, so
+# only processes that serve requests ever run the cleanup.
+app.config['SESSION_CLEANUP_N_REQUESTS'] = int(os.getenv('SESSION_CLEANUP_N_REQUESTS', '100'))
+# The cookie only carries the signed session id. Secure is opt-in so plain
+# http:// LAN access keeps working; set it when served only via HTTPS.
+app.config['SESSION_COOKIE_SECURE'] = os.getenv('SESSION_COOKIE_SECURE', 'false').lower() == 'true'
+app.config['SESSION_COOKIE_HTTPONLY'] = True
+app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
+
+# --- Response Compression ---
+# Proxied event lists are large JSON payloads; images (already JPEG) are left
+# out of the mimetype list so they are served uncompressed.
+app.config['COMPRESS_MIMETYPES'] = ['application/json', 'text/html', 'text/css', 'application/javascript']
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+app.config['COMPRESS_LEVEL'] = 4
+app.config['COMPRESS_BR_LEVEL'] = 4
+app.config['COMPRESS_MIN_SIZE'] = 1024
 
 # DB Manager API URL
 DB_MANAGER_API_URL = os.getenv('DB_MANAGER_API_URL', 'http://localhost:5001')
 
+# Keep-alive connections to DB Manager, shared by this worker's threads.
+# Retries cover connect errors only: a read timeout or error status is never
+# replayed, so a hanging DB Manager costs one timeout rather than three.
+DB_MANAGER_CONNECT_TIMEOUT = 3  # seconds, per connection attempt
+DB_MANAGER_READ_TIMEOUT = 10
+DB_MANAGER_CONNECT_RETRIES = 2
+DB_MANAGER_RETRY_BACKOFF = 0.1
+db_manager_session = requests.Session()
+_db_manager_adapter = HTTPAdapter(pool_connections=1, pool_maxsize=16,
+                                  max_retries=Retry(connect=DB_MANAGER_CONNECT_RETRIES, read=0,
+                                                    status=0, other=0,
+                                                    backoff_factor=DB_MANAGER_RETRY_BACKOFF))
+db_manager_session.mount('http://', _db_manager_adapter)
+db_manager_session.mount('https://', _db_manager_adapter)
+PROXY_FORWARD_HEADERS = ('Content-Type', 'If-None-Match')
+
+# Event images (read-only mount shared with anpr-db-manager), resolved once
+IMAGE_DIR = os.path.realpath('/app/anpr_images')
+IMAGE_MAX_AGE = 86400  # event images never change once written
+
+# Post-login redirect targets must be local paths: rejects absolute URLs,
+# protocol-relative ("//host") and backslash ("/\host") bypasses, plus any
+# whitespace/control character browsers would strip ("/\t/host" -> "//host").
+_SAFE_NEXT_RE = re.compile(r'^/[^/\\\x00-\x20\x7f][^\x00-\x20\x7f]*\Z')
+
+# --- Session table statements ---
+# Built once at import so every request reuses the same TextClause (and its
+# cached compiled form) instead of re-formatting the SQL string per call.
+SESSION_TABLE = app.config.get('SESSION_SQLALCHEMY_TABLE', 'sessions')
+_UPDATE_SESSION_IP = db.text(f"UPDATE {SESSION_TABLE} SET ip_address = :ip WHERE session_id = :sid")
+_SELECT_SESSIONS = db.text(
+    f"SELECT id, session_id, expiry, ip_address, data FROM {SESSION_TABLE} WHERE expiry > UTC_TIMESTAMP()"
+)
+_DELETE_SESSION = db.text(f"DELETE FROM {SESSION_TABLE} WHERE id = :id")
+_DELETE_OTHER_SESSIONS = db.text(f"DELETE FROM {SESSION_TABLE} WHERE session_id != :sid")
+_DELETE_ALL_SESSIONS = db.text(f"DELETE FROM {SESSION_TABLE}")
+
+class SessionData(msgspec.Struct):
+    """Subset of a flask-session msgpack payload needed to identify its user."""
+    user_id: str | int | None = msgspec.field(name='_user_id', default=None)
+
+# Reused decoder: msgspec caches its type-dispatch tables per Decoder instance
+_SESSION_DECODER = msgspec.msgpack.Decoder(SessionData)
+
 # --- Initialize Extensions ---
 db.init_app(app)
 login_manager = LoginManager()
@@ -40,19 +140,63 @@ login_manager.login_view = 'login'
 # Initialize server-side sessions
 sess = Session(app)
 
+# Initialize response compression
+compress = Compress(app)
+
 # --- User Loader ---
+class CachedUser(UserMixin):
+    """Detached snapshot of a User row; enough for authenticated requests."""
+    def __init__(self, id, username, role):
+        self.id = id
+        self.username = username
+        self.role = role
+
+    @property
+    def is_admin(self):
+        return self.role == 'admin'
+
+# Every polled /api/* call and image fetch runs the user loader; keep the
+# row for a short while per worker instead of querying MariaDB each time.
+# Admin edits invalidate this worker's entry; other workers expire by TTL.
+USER_CACHE_TTL = 30  # seconds
+_user_cache = {}  # user id -> (time.monotonic(), CachedUser)
+
+def invalidate_cached_user(user_id):
+    _user_cache.pop(user_id, None)
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    user_id = int(user_id)
+    entry = _user_cache.get(user_id)
+    if entry and time.monotonic() - entry[0] < USER_CACHE_TTL:
+        return entry[1]
+    user = User.query.get(user_id)
+    if user is None:
+        invalidate_cached_user(user_id)
+        return None
+    cached = CachedUser(user.id, user.username, user.role)
+    _user_cache[user_id] = (time.monotonic(), cached)
+    return cached
 
 # --- Decorators ---
+def session_is_admin():
+    """Admin flag cached in the server-side session at login (0/1).
+
+    Sessions created before the flag existed fall back to the user's role once
+    and cache the result."""
+    is_admin = session.get('is_admin')
+    if is_admin is None:
+        is_admin = session['is_admin'] = 1 if current_user.is_admin else 0
+    return is_admin
+
 def admin_required(f):
     """Decorator that ensures the current user is an admin."""
     @wraps(f)
     @login_required
     def decorated(*args, **kwargs):
-        if not current_user.is_admin:
-            abort(403)
+        if not session_is_admin():
+            # Plain response instead of abort(403): no HTTPException raise/unwind
+            return 'Forbidden', 403
         return f(*args, **kwargs)
     return decorated
 
@@ -76,6 +220,7 @@ def login():
         if user and user.check_password(password):
             login_user(user)
             session.permanent = True
+            session['is_admin'] = 1 if user.is_admin else 0
             
             # Capture and save IP address to the session record
             # Handle potential proxies like Cloudflare
@@ -83,23 +228,19 @@ def login():
             if ip_addr and ',' in ip_addr:
                 ip_addr = ip_addr.split(',')[0].strip()
             
-            session_model = app.config.get('SESSION_SQLALCHEMY_TABLE', 'sessions')
             try:
                 # Update the session record with the IP address
                 # flask-session stores the sid in the session object
                 prefix = app.config.get('SESSION_KEY_PREFIX', '')
                 full_sid = f"{prefix}{session.sid}"
-                db.session.execute(
-                    db.text(f"UPDATE {session_model} SET ip_address = :ip WHERE session_id = :sid"),
-                    {"ip": ip_addr, "sid": full_sid}
-                )
+                db.session.execute(_UPDATE_SESSION_IP, {"ip": ip_addr, "sid": full_sid})
                 db.session.commit()
             except Exception as e:
                 db.session.rollback()
                 print(f"Error saving IP to session: {e}")
 
             next_page = request.args.get('next')
-            if not next_page or urlparse(next_page).netloc != '':
+            if not next_page or not _SAFE_NEXT_RE.match(next_page):
                 next_page = url_for('index')
             return redirect(next_page)
         else:
@@ -111,6 +252,7 @@ def login():
 @login_required
 def logout():
     logout_user()
+    session.pop('is_admin', None)
     return redirect(url_for('login'))
 
 @app.route('/')
@@ -129,25 +271,16 @@ def admin_panel():
 @admin_required
 def list_sessions():
     """List all active server-side sessions."""
-    session_model = app.config.get('SESSION_SQLALCHEMY_TABLE', 'sessions')
     current_sid = getattr(session, 'sid', None)
     try:
-        result = db.session.execute(
-            db.text(f"SELECT id, session_id, expiry, ip_address FROM {session_model}")
-        )
+        result = db.session.execute(_SELECT_SESSIONS)
         sessions_list = []
-        import msgspec
         for row in result:
             session_data = {}
             try:
                 # Try to decode session data to get user info
-                raw = db.session.execute(
-                    db.text(f"SELECT data FROM {session_model} WHERE id = :id"),
-                    {"id": row.id}
-                ).fetchone()
-                if raw and raw.data:
-                    decoded = msgspec.msgpack.decode(raw.data)
-                    user_id = decoded.get('_user_id')
+                if row.data:
+                    user_id = _SESSION_DECODER.decode(row.data).user_id
                     if user_id:
                         user = User.query.get(int(user_id))
                         session_data['username'] = user.username if user else f'Unknown (ID:{user_id})'
@@ -177,12 +310,8 @@ def list_sessions():
 @admin_required
 def revoke_session(session_id):
     """Revoke a single session by its DB id."""
-    session_model = app.config.get('SESSION_SQLALCHEMY_TABLE', 'sessions')
     try:
-        db.session.execute(
-            db.text(f"DELETE FROM {session_model} WHERE id = :id"),
-            {"id": session_id}
-        )
+        db.session.execute(_DELETE_SESSION, {"id": session_id})
         db.session.commit()
         return jsonify({'status': 'ok', 'message': 'Session revoked'})
     except Exception as e:
@@ -193,16 +322,14 @@ def revoke_session(session_id):
 @admin_required
 def revoke_all_sessions():
     """Revoke all sessions EXCEPT the current one."""
-    session_model = app.config.get('SESSION_SQLALCHEMY_TABLE', 'sessions')
     current_sid = getattr(session, 'sid', None)
     try:
         if current_sid:
-            result = db.session.execute(
-                db.text(f"DELETE FROM {session_model} WHERE session_id != :sid"),
-                {"sid": current_sid}
-            )
+            # Stored session ids carry the key prefix (see login / list_sessions)
+            prefix = app.config.get('SESSION_KEY_PREFIX', '')
+            result = db.session.execute(_DELETE_OTHER_SESSIONS, {"sid": f"{prefix}{current_sid}"})
         else:
-            result = db.session.execute(db.text(f"DELETE FROM {session_model}"))
+            result = db.session.execute(_DELETE_ALL_SESSIONS)
         db.session.commit()
         return jsonify({'status': 'ok', 'message': f'Sessions revoked ({result.rowcount} removed). Your session was preserved.'})
     except Exception as e:
@@ -215,10 +342,11 @@ def revoke_all_sessions():
 @admin_required
 def list_users():
     """List all viewer users (admin users hidden from web UI)."""
-    users = User.query.filter_by(role='viewer').all()
+    # Only the listed columns: no password hashes, no ORM object hydration
+    rows = db.session.query(User.id, User.username).filter_by(role='viewer').all()
     return jsonify({
-        'users': [{'id': u.id, 'username': u.username, 'role': u.role} for u in users],
-        'count': len(users)
+        'users': [{'id': user_id, 'username': username, 'role': 'viewer'} for user_id, username in rows],
+        'count': len(rows)
     })
 
 def is_password_strong(password):
@@ -230,11 +358,22 @@ def is_password_strong(password):
     """
     if len(password) < 10:
         return False, "Password must be at least 10 characters long."
-    if not any(c.isupper() for c in password):
+    # Single pass over the password; stops as soon as all classes are seen
+    has_upper = has_lower = has_digit = False
+    for c in password:
+        if c.isupper():
+            has_upper = True
+        elif c.islower():
+            has_lower = True
+        elif c.isdigit():
+            has_digit = True
+        if has_upper and has_lower and has_digit:
+            break
+    if not has_upper:
         return False, "Password must contain at least one uppercase letter."
-    if not any(c.islower() for c in password):
+    if not has_lower:
         return False, "Password must contain at least one lowercase letter."
-    if not any(c.isdigit() for c in password):
+    if not has_digit:
         return False, "Password must contain at least one digit."
     return True, ""
 
@@ -256,7 +395,7 @@ def create_viewer_user():
     if not is_strong:
         return jsonify({'error': msg}), 400
 
-    if User.query.filter_by(username=username).first():
+    if db.session.query(User.query.filter_by(username=username).exists()).scalar():
         return jsonify({'error': f'User "{username}" already exists'}), 409
 
     user = User(username=username, role='viewer')
@@ -287,6 +426,7 @@ def update_viewer_user(user_id):
 
     user.username = new_username
     db.session.commit()
+    invalidate_cached_user(user_id)
     return jsonify({'status': 'ok', 'message': f'Username updated to "{new_username}"'})
 
 @app.route('/admin/users/<int:user_id>/reset-password', methods=['POST'])
@@ -308,6 +448,7 @@ def reset_viewer_password(user_id):
 
     user.set_password(new_password)
     db.session.commit()
+    invalidate_cached_user(user_id)
     return jsonify({'status': 'ok', 'message': f'Password reset for "{user.username}"'})
 
 @app.route('/admin/users/<int:user_id>', methods=['DELETE'])
@@ -323,10 +464,79 @@ def delete_viewer_user(user_id):
     username = user.username
     db.session.delete(user)
     db.session.commit()
+    invalidate_cached_user(user_id)
     return jsonify({'status': 'ok', 'message': f'User "{username}" deleted'})
 
 # --- API Proxy Routes ---
 
+# Short-lived per-worker cache for the dashboard's polled GETs, keyed by
+# (path, query string). Entries past their TTL are kept (bounded) so a DB
+# Manager outage can still be answered with the last good copy.
+PROXY_CACHE_TTLS = {'cameras': 60, 'events/latest_timestamp': 5}  # seconds
+PROXY_CACHE_MAX_ENTRIES = 256
+_proxy_cache = {}  # key -> (time.monotonic(), body, status, headers)
+_proxy_cache_lock = Lock()
+
+def get_cached_proxy_entry(key, ttl=None):
+    """Cached entry for key, or None if missing (or older than ttl, when given)."""
+    with _proxy_cache_lock:
+        entry = _proxy_cache.get(key)
+    if entry and (ttl is None or time.monotonic() - entry[0] < ttl):
+        return entry
+    return None
+
+def store_proxy_entry(key, body, status, headers):
+    entry = (time.monotonic(), body, status, headers)
+    with _proxy_cache_lock:
+        _proxy_cache.pop(key, None)
+        if len(_proxy_cache) >= PROXY_CACHE_MAX_ENTRIES:
+            del _proxy_cache[next(iter(_proxy_cache))]  # oldest first
+        _proxy_cache[key] = entry
+    return entry
+
+# Single-flight gate: concurrent cache misses for the same key share one
+# upstream call instead of each hitting DB Manager.
+# Followers wait out the leader's worst case: every connect attempt timing
+# out (plus retry backoff) followed by a full read timeout, with 1s of slack.
+PROXY_INFLIGHT_TIMEOUT = (
+    (DB_MANAGER_CONNECT_RETRIES + 1) * DB_MANAGER_CONNECT_TIMEOUT
+    + DB_MANAGER_RETRY_BACKOFF * (2 ** DB_MANAGER_CONNECT_RETRIES - 1)
+    + DB_MANAGER_READ_TIMEOUT
+    + 1
+)
+_proxy_inflight = {}  # key -> Future of the in-flight requests.Response
+_proxy_inflight_lock = Lock()
+
+def coalesced_fetch(key, fetch):
+    """Run fetch() once per key at a time; concurrent callers get its result (or exception)."""
+    with _proxy_inflight_lock:
+        future = _proxy_inflight.get(key)
+        is_leader = future is None
+        if is_leader:
+            future = _proxy_inflight[key] = Future()
+    if not is_leader:
+        try:
+            return future.result(timeout=PROXY_INFLIGHT_TIMEOUT)
+        except FutureTimeoutError:
+            raise requests.exceptions.Timeout("Timed out waiting for in-flight DB Manager request")
+    try:
+        result = fetch()
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        with _proxy_inflight_lock:
+            _proxy_inflight.pop(key, None)
+
+def cached_proxy_response(entry, cache_state):
+    """Rebuild a response from a cache entry; honours If-None-Match against its ETag."""
+    resp = app.response_class(entry[1], status=entry[2], headers=entry[3])
+    resp.headers['X-Cache'] = cache_state
+    return resp.make_conditional(request)
+
 @app.route('/api/<path:path>', methods=['GET', 'POST', 'PUT', 'DELETE'])
 @login_required
 def api_proxy(path):
@@ -334,70 +544,96 @@ def api_proxy(path):
     Viewer users are restricted to GET requests only.
     """
     # Role-based restriction: viewers can only read
-    if not current_user.is_admin and request.method != 'GET':
+    if not session_is_admin() and request.method != 'GET':
         return jsonify({"error": "Permission denied. Viewer accounts are read-only."}), 403
 
     url = f"{DB_MANAGER_API_URL}/api/{path}"
 
-    # Forward query parameters
-    if request.query_string:
-        url += f"?{request.query_string.decode('utf-8')}"
+    cache_ttl = PROXY_CACHE_TTLS.get(path) if request.method == 'GET' else None
+    cache_key = (path, request.query_string)
+    if cache_ttl:
+        entry = get_cached_proxy_entry(cache_key, cache_ttl)
+        if entry:
+            return cached_proxy_response(entry, 'HIT')
+
+    # Forward the body verbatim plus the few headers DB Manager uses;
+    # the session cookie and auth headers stay here.
+    headers = {name: request.headers[name] for name in PROXY_FORWARD_HEADERS if name in request.headers}
+    if cache_ttl:
+        # The full body is needed to fill the cache; 304s are answered locally
+        headers.pop('If-None-Match', None)
 
     try:
         # Forward the request to DB Manager
-        if request.method == 'GET':
-            response = requests.get(url, timeout=10)
-        elif request.method == 'POST':
-            response = requests.post(url, json=request.get_json(), timeout=10)
-        elif request.method == 'PUT':
-            response = requests.put(url, json=request.get_json(), timeout=10)
-        elif request.method == 'DELETE':
-            response = requests.delete(url, timeout=10)
-
-        # Return the response from DB Manager
-        return response.content, response.status_code, {'Content-Type': response.headers.get('Content-Type', 'application/json')}
+        # The raw query string is passed through untouched (no decode/re-encode)
+        def fetch():
+            return db_manager_session.request(request.method, url, params=request.query_string,
+                                              data=request.get_data(cache=False),
+                                              headers=headers,
+                                              timeout=(DB_MANAGER_CONNECT_TIMEOUT, DB_MANAGER_READ_TIMEOUT))
+        response = coalesced_fetch(cache_key, fetch) if cache_ttl else fetch()
+
+        # Return the response from DB Manager (with its validators, if any)
+        response_headers = {'Content-Type': response.headers.get('Content-Type', 'application/json')}
+        for name in ('ETag', 'Cache-Control'):
+            if name in response.headers:
+                response_headers[name] = response.headers[name]
+        if cache_ttl and response.status_code == 200:
+            entry = store_proxy_entry(cache_key, response.content, response.status_code, response_headers)
+            return cached_proxy_response(entry, 'MISS')
+        if cache_ttl and response.status_code >= 500:
+            stale = get_cached_proxy_entry(cache_key)
+            if stale:
+                return cached_proxy_response(stale, 'STALE')
+        return response.content, response.status_code, response_headers
 
     except requests.exceptions.RequestException as e:
+        stale = get_cached_proxy_entry(cache_key) if cache_ttl else None
+        if stale:
+            return cached_proxy_response(stale, 'STALE')
         return jsonify({"error": f"Failed to connect to DB Manager: {str(e)}"}), 503
 
 @app.route('/images/<path:filename>')
 @login_required
 def serve_image(filename):
     """Serve images from the anpr_images directory."""
-    images_dir = '/app/anpr_images'
-    return send_from_directory(images_dir, filename)
+    resp = send_from_directory(IMAGE_DIR, filename, conditional=True, max_age=IMAGE_MAX_AGE)
+    # Write-once files: no revalidation needed. 'private' keeps these
+    # login-protected images out of shared caches (Cloudflare edge).
+    resp.headers['Cache-Control'] = f'private, max-age={IMAGE_MAX_AGE}, immutable'
+    return resp
 
 # --- Database Initialization ---
-with app.app_context():
-    # Create tables if they don't exist (user table + sessions table)
-    db.create_all()
+def init_schema():
+    """Create/migrate the anpr-web tables (user + sessions).
 
-    # Add 'role' column if it doesn't exist (ALTER TABLE for existing DBs)
-    try:
+    Runs once per deployment via `flask --app app.anpr_web init-db` before
+    Gunicorn starts, so workers don't race N parallel DDL statements at boot."""
+    with app.app_context():
+        # Create tables if they don't exist (user table + sessions table)
+        db.create_all()
+
+        # Add columns missing on databases created by older versions
         db.session.execute(db.text(
-            "ALTER TABLE user ADD COLUMN role VARCHAR(20) NOT NULL DEFAULT 'viewer'"
+            "ALTER TABLE user ADD COLUMN IF NOT EXISTS role VARCHAR(20) NOT NULL DEFAULT 'viewer'"
+        ))
+        db.session.execute(db.text(
+            f"ALTER TABLE {SESSION_TABLE} ADD COLUMN IF NOT EXISTS ip_address VARCHAR(45) NULL"
         ))
-        db.session.commit()
-        print("Added 'role' column to user table.")
-    except Exception:
-        db.session.rollback()
-        # Column already exists, no action needed
 
-    # Add 'ip_address' column to sessions table if it doesn't exist
-    try:
-        session_model = app.config.get('SESSION_SQLALCHEMY_TABLE', 'sessions')
+        # Index expiry so session cleanup and the active-session listing stay cheap
         db.session.execute(db.text(
-            f"ALTER TABLE {session_model} ADD COLUMN ip_address VARCHAR(45) NULL"
+            f"CREATE INDEX IF NOT EXISTS ix_sessions_expiry ON {SESSION_TABLE} (expiry)"
         ))
         db.session.commit()
-        print(f"Added 'ip_address' column to {session_model} table.")
-    except Exception:
-        db.session.rollback()
-        # Column already exists, no action needed
-
-
+        print("anpr-web database schema is up to date.")
 
+@app.cli.command('init-db')
+def init_db_command():
+    """Create or migrate the anpr-web database schema."""
+    init_schema()
 
 if __name__ == '__main__':
+    init_schema()
     server_port = int(os.getenv('FLASK_RUN_PORT', 5000))
     app.run(host='0.0.0.0', port=server_port, debug=False)
@@ -4,6 +4,8 @@ import bcrypt
 
 db = SQLAlchemy()
 
+BCRYPT_ROUNDS = 12  # explicit work factor (matches bcrypt's current default)
+
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(150), unique=True, nullable=False)
@@ -15,7 +17,7 @@ class User(UserMixin, db.Model):
         return self.role == 'admin'
 
     def set_password(self, password):
-        self.password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        self.password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode('utf-8')
 
     def check_password(self, password):
         return bcrypt.checkpw(password.encode('utf-8'), self.password.encode('utf-8'))
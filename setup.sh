@@ -279,12 +279,12 @@ setup_admin_user() {
         return
     fi
     
-    # Check if any users exist
+    # Check if any users exist (EXISTS: stops at the first row instead of counting)
     USER_COUNT=$(docker exec anpr-web python -c "
 from app.models import db, User
 from app.anpr_web import app
 with app.app_context():
-    print(User.query.count())
+    print(1 if db.session.query(User.query.exists()).scalar() else 0)
 " 2>/dev/null || echo "0")
     
     if [ "$USER_COUNT" -gt 0 ]; then